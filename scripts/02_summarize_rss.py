@@ -1,9 +1,10 @@
 # 02_summarize_rss.py  ←フルリセット版
 import os
 import re
-import html
 import feedparser
 
+from textnorm import entry_body, norm, norm_words
+
 # --- RSS（まずは2本。あとで増やせます） ---
 FEEDS = [
     "https://www.pref.iwate.jp/news.rss",
@@ -21,29 +22,21 @@ KEYWORDS = [
     "岩手","盛岡","花巻","北上","奥州","一関","二戸","久慈","宮古","大船渡","陸前高田","滝沢",
 ]
 
-SUMMARY_LEN = 120  # 目安
+KEYWORDS_N = norm_words(KEYWORDS)  # 判定用（NFKC + casefold 済み）
 
-def contains_keywords(text: str) -> bool:
-    t = text or ""
-    return any(k in t for k in KEYWORDS)
+SUMMARY_LEN = 120  # 目安
 
-def clean_html(s: str) -> str:
-    s = html.unescape(s or "")
-    return re.sub(r"<[^>]+>", "", s)
+def contains_keywords(text_lc: str) -> bool:
+    # text_lc は textnorm.norm 済み
+    return any(k in text_lc for k in KEYWORDS_N)
 
 def extract_body(entry) -> str:
     """
     RSSエントリから本文候補をできるだけ拾ってテキスト化
     優先: content[0].value → summary/description → ""
+    （タグ除去・実体参照・空白の畳み込みは textnorm で1パス）
     """
-    if entry.get("content") and isinstance(entry["content"], list) and entry["content"]:
-        val = entry["content"][0].get("value") or ""
-        if val.strip():
-            return clean_html(val)
-    val = entry.get("summary") or entry.get("description") or ""
-    if val.strip():
-        return clean_html(val)
-    return ""
+    return entry_body(entry)
 
 def fallback_summary(title: str, body: str) -> str:
     base = (body or title or "").strip()
@@ -130,7 +123,7 @@ def main():
             title = (e.get("title") or "").strip()
             link  = e.get("link") or ""
             body  = extract_body(e)
-            haystack = f"{title}\n{body}"
+            haystack = norm(title, body)
 
             if contains_keywords(haystack):  # ←ここがキーワード抽出
                 ai = summarize_ja(title, body, link)
@@ -1,21 +1,25 @@
 # 03_build_html.py  (feeds.txt + meta description scrape + 強化フィルタ)
-import re
 import html
 import time
 import socket
 import urllib.request
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 from pathlib import Path
 
 import feedparser
 from bs4 import BeautifulSoup
 
+from textnorm import entry_body, fold, norm
+from itemindex import ItemIndex, item_key
+
 # --- paths ---
 ROOT = Path(r"C:\iwate_news")
 CONFIG_DIR = ROOT / "config"
 SITE_DIR = ROOT / "site"
 SITE_DIR.mkdir(parents=True, exist_ok=True)
+INDEX_PATH = ROOT / "data" / "item_index.json"  # 初出時刻つきの採用アイテム（itemindex.py）
+INDEX_KEEP_DAYS = 60  # インデックスに残す日数（04 の ARCHIVE_DAYS と同じ）
 
 SITE_TITLE = "岩手県 不動産ニュースまとめ（見出し＋リンク）"
 SITE_DESC  = "岩手×不動産・土地・建設・都市計画の新着情報をRSSから自動抽出（要約なし・軽量MVP）"
@@ -50,6 +54,12 @@ NEGATIVE_KEYWORDS = [
     "天気","気温","猛暑","寒波","降雪","台風","地震速報"
 ]
 
+# 判定用（NFKC + casefold 済み。haystack 側も textnorm.norm で同じ形にそろえる）
+# count_hits の件数が変わらないよう重複語はそのまま残す
+TOPIC_KEYWORDS_N = [fold(w) for w in TOPIC_KEYWORDS]
+GEO_KEYWORDS_N = [fold(w) for w in GEO_KEYWORDS]
+NEGATIVE_KEYWORDS_N = [fold(w) for w in NEGATIVE_KEYWORDS]
+
 # --- feeds fallback (feeds.txt が無い/空のとき) ---
 DEFAULT_FEEDS = [
     "https://www.pref.iwate.jp/news.rss",
@@ -81,10 +91,6 @@ def read_feeds_from_txt(path: Path) -> list[str]:
             urls.append(s)
     return urls
 
-def clean_html(s: str) -> str:
-    s = html.unescape(s or "")
-    return re.sub(r"<[^>]+>", "", s)
-
 def host_of(url: str) -> str:
     try:
         return urlparse(url).netloc
@@ -115,10 +121,10 @@ def is_iwate_gov_domain(netloc: str) -> bool:
 
 def filter_match(text: str, netloc: str) -> bool:
     # 除外語が含まれるなら即NG
-    if any(w in (text or "") for w in NEGATIVE_KEYWORDS):
+    if any(w in (text or "") for w in NEGATIVE_KEYWORDS_N):
         return False
-    topic = count_hits(text, TOPIC_KEYWORDS)
-    geo   = count_hits(text, GEO_KEYWORDS)
+    topic = count_hits(text, TOPIC_KEYWORDS_N)
+    geo   = count_hits(text, GEO_KEYWORDS_N)
     # 受理ルール：
     # 1) トピック1以上 かつ (地名1以上 or 岩手系ドメイン)
     if topic >= 1 and (geo >= 1 or is_iwate_gov_domain(netloc)):
@@ -139,8 +145,10 @@ def _fetch_meta_description(url: str, timeout: int = SCRAPE_TIMEOUT) -> str:
     except Exception:
         return ""
 
-def fetch_items(feeds: list[str]):
+def fetch_items(feeds: list[str], index: ItemIndex | None = None):
+    # index を渡すと、今回取得したのに採用しなかったエントリを index から消す
     items = []
+    fetched = set()
     scraped = 0
     total_entries = 0
 
@@ -162,11 +170,7 @@ def fetch_items(feeds: list[str]):
             netloc = host_of(link)
 
             # RSS内の本文候補
-            body = ""
-            if e.get("content") and isinstance(e["content"], list) and e["content"]:
-                body = clean_html(e["content"][0].get("value") or "")
-            if not body:
-                body = clean_html(e.get("summary") or e.get("description") or "")
+            body = entry_body(e)
 
             # 本文が薄い時だけ meta description を見る（上限つき）
             if USE_PAGE_SCRAPE and not body and link and scraped < MAX_SCRAPE_PER_RUN:
@@ -176,17 +180,17 @@ def fetch_items(feeds: list[str]):
                     scraped += 1
                     print(f"[scrape] {link} -> meta description captured")
 
-            haystack = f"{title}\n{body}"
+            haystack = norm(title, body)
+            if index is not None:
+                fetched.add(item_key({"title": title, "url": link}))
 
             if filter_match(haystack, netloc):
-                # 日付
+                # 日付（無ければ None のまま。ItemIndex が初出時刻を割り当てる）
                 pub = None
                 for key in ("published_parsed", "updated_parsed"):
                     if e.get(key):
                         pub = to_iso(e.get(key))
                         break
-                if not pub:
-                    pub = to_iso(None)
 
                 items.append({
                     "title": title,
@@ -195,11 +199,15 @@ def fetch_items(feeds: list[str]):
                     "published": pub,
                 })
 
-    items.sort(key=lambda x: x["published"], reverse=True)
     print(f"[sum] total_entries={total_entries}, extracted={len(items)}, scraped={scraped}")
-    return items[:MAX_ITEMS]
+    if index is not None:
+        now = datetime.now(timezone.utc)
+        removed = sum(index.remove(iid, now) for iid in fetched - {item_key(it) for it in items})
+        print(f"[index] 今回不採用 → 削除 {removed}件")
+    return items
 
 def build_html(items):
+    # items は ItemIndex.latest() の新しい順。並べ替えはしない
     css = """
     body{font-family:-apple-system,BlinkMacSystemFont,Segoe UI,Roboto,Helvetica,Arial,"Noto Sans JP",sans-serif;line-height:1.6;margin:20px;}
     header{margin-bottom:16px}
@@ -232,7 +240,7 @@ def build_html(items):
         f"<div class=\"desc\">{html.escape(SITE_DESC)}</div>",
         "</header>",
     ]
-    for day in sorted(groups.keys(), reverse=True):
+    for day in groups:  # items が新しい順なので日付も新しい順
         parts.append(f"<div class=\"date\">📅 {day}</div>")
         for it in groups[day]:
             title = html.escape(it["title"] or "(無題)")
@@ -259,9 +267,17 @@ def main():
         print(f"[info] feeds.txt が見つからない/空のためデフォルトFEEDS({len(feeds)})を使用")
     else:
         print(f"[info] feeds.txt から {len(feeds)} 本のRSSを読み込み")
-    items = fetch_items(feeds)
-    out = build_html(items)
-    print(f"生成: {out}（{len(items)}件）")
+    index = ItemIndex(INDEX_PATH)
+    items = fetch_items(feeds, index)
+    now = datetime.now(timezone.utc)
+    for it in items:
+        it["published"] = index.add(it, it["published"], now)
+    # 直近 INDEX_KEEP_DAYS 日 + 新しい方から MAX_ITEMS 件だけ残す。今回採用したものは古くても残す
+    index.prune(now - timedelta(days=INDEX_KEEP_DAYS), MAX_ITEMS, {item_key(it) for it in items})
+    index.save()
+    shown = index.latest(MAX_ITEMS)
+    out = build_html(shown)
+    print(f"生成: {out}（{len(shown)}件 / 今回採用 {len(items)}件）")
 
 if __name__ == "__main__":
     main()
@@ -5,30 +5,47 @@
 # ・日本語の表記ゆれに強くするため NFKC 正規化
 
 import os
-import re
 import html
 import time
 import socket
-import unicodedata
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse
 from pathlib import Path
 
 import feedparser
 
+from textnorm import entry_body, norm
+from kwtable import TABLE
+from relevance import THRESHOLD, load_model
+from trendstats import update_and_render
+from postrender import optimize_site, write_page
+from itemindex import JST, ItemIndex, item_key
+
 # ==== パス・基本設定 ====
 ROOT = Path(os.getenv("IWATE_ROOT", ".")).resolve()
 CONFIG_DIR = ROOT / "config"
 SITE_DIR = ROOT / "site"
 SITE_DIR.mkdir(parents=True, exist_ok=True)
+STATS_DIR = ROOT / "data" / "stats"  # 集計の列ファイル（trendstats.py）
+INDEX_PATH = ROOT / "data" / "item_index.json"  # 初出時刻つきの採用アイテム（itemindex.py）
 
 SITE_TITLE_TEXT = "岩手県 不動産まとめサイト（毎日7:00自動更新）"  # ← タブ表示用（改行なし）
 SITE_TITLE_HTML = "岩手県 不動産まとめサイト<br>（毎日7:00自動更新）"  # ← ページ見出し用
 SITE_DESC  = '<a href="https://www.greo-jp.com/" target="_blank">GREO合同会社が運営するまとめサイトです。</a>'
 MAX_ITEMS = 1000
+ARCHIVE_DAYS = 60  # archive/<日付>.html を作る日数（成果物が日々増え続けないよう直近だけ）
+# data/item_index.json に残す範囲: 直近 ARCHIVE_DAYS 日 + 新しい方から MAX_ITEMS 件（どちらかに入れば残す）
 
 socket.setdefaulttimeout(6)  # ネットワーク全体の安全タイムアウト（秒）
 
+# ==== 関連度スコア（任意。config/relevance_model.npz と numpy が必要）====
+#   off      : キーワード規則のみ（既定）
+#   gate     : 規則で採用 かつ スコア >= THRESHOLD のものだけ残す
+#   tiebreak : 含める語と除外語の両方にヒットした「競合」だけスコアで決める（ALL フィードは対象外）
+SCORER_MODE = os.getenv("IWATE_SCORER", "off").lower()
+# 全エントリの規則判定を TSV（ラベル, タイトル, 本文）で追記する。relevance.py の学習データの元
+DECISION_LOG = os.getenv("IWATE_DECISION_LOG", "")
+
 # ==== グローバル語（ベース：ユーザー指定）====
 GLOBAL_INCLUDE = [
     "不動産","地価","地価調査","公示地価","路線価","固定資産税","地価指数",
@@ -48,6 +65,10 @@ GLOBAL_EXCLUDE = [
     "猛暑","天気","殺","防災",
 ]
 
+# 判定用: 共有キーワード表（kwtable.TABLE）上のビット集合
+GLOBAL_INCLUDE_MASK = TABLE.mask(GLOBAL_INCLUDE)
+GLOBAL_EXCLUDE_MASK = TABLE.mask(GLOBAL_EXCLUDE)
+
 # ==== デフォルトFEEDS（feeds.txtが空/無いとき）====
 DEFAULT_FEEDS = [
     "https://www.pref.iwate.jp/news.rss",
@@ -55,10 +76,6 @@ DEFAULT_FEEDS = [
 ]
 
 # ==== ユーティリティ ====
-def clean_html(s: str) -> str:
-    s = html.unescape(s or "")
-    return re.sub(r"<[^>]+>", "", s)
-
 def host_of(url: str) -> str:
     try:
         return urlparse(url).netloc
@@ -72,33 +89,31 @@ def to_iso(dt) -> str:
 
 def iso_to_ymd_jst(iso: str) -> str:
     try:
-        dt = datetime.fromisoformat(iso.replace("Z", "+00:00")).astimezone()
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00")).astimezone(JST)
         return dt.strftime("%Y-%m-%d")
     except Exception:
         return ""
 
-def norm(s: str) -> str:
-    # 全角/半角・濁点などを統一してから小文字化
-    s = unicodedata.normalize("NFKC", s or "")
-    return s.lower()
-
-def any_hit(text_lc: str, words: list[str]) -> bool:
-    if not words:
-        return False
-    for w in set(words):
-        w = norm(w)
-        if w and w in text_lc:
-            return True
-    return False
-
-def none_hit(text_lc: str, words: list[str]) -> bool:
-    if not words:
-        return True
-    for w in set(words):
-        w = norm(w)
-        if w and w in text_lc:
-            return False
-    return True
+def _tsv(s: str) -> str:
+    return " ".join((s or "").split())
+
+def apply_scorer(pending: list[tuple], scorer) -> list[dict]:
+    # pending: (item, hay_lc, rule_ok) の列。1回の実行分をまとめて採点する
+    if scorer is None:
+        return [it for it, _, ok in pending if ok]
+    start = time.perf_counter()
+    scores = scorer.score([hay for _, hay, _ in pending])
+    took = (time.perf_counter() - start) * 1000
+    items = []
+    for (it, _, ok), sc in zip(pending, scores):
+        if SCORER_MODE == "gate":
+            keep = ok and sc >= THRESHOLD
+        else:
+            keep = ok or sc >= THRESHOLD
+        if keep:
+            items.append(it)
+    print(f"[score] mode={SCORER_MODE} scored={len(pending)} kept={len(items)} {took:.1f}ms")
+    return items
 
 # ==== feeds.txt の読み込み ====
 # 1行:  URL | <含める語spec> | <除外語spec>
@@ -152,46 +167,48 @@ def read_feeds_with_rules(path: Path):
         inc_upper = inc_spec.strip().upper()
         pass_all = inc_upper in ("ALL", "*", "ALL!")
 
-        # ALLでも exc_words は保持（inc は無視）
+        # ALLでも exc は保持（inc は無視）。語は共有表に登録してビット集合だけ持つ
         feeds.append({
             "url": url,
             "pass_all": pass_all,
             "inc_mode": "override" if pass_all else inc_mode,
-            "inc_words": [] if pass_all else inc_words,
+            "inc_mask": 0 if pass_all else TABLE.mask(inc_words),
             "exc_mode": exc_mode,
-            "exc_words": exc_words,
+            "exc_mask": TABLE.mask(exc_words),
         })
     return feeds
 
 # ==== アイテム抽出 → HTML ====
-def fetch_items(feed_rules: list[dict]):
-    items = []
+def fetch_items(feed_rules: list[dict], index: ItemIndex | None = None):
+    # index を渡すと、今回取得したのに採用しなかったエントリを index から消す
+    pending = []    # (item, hay_lc, 規則での採否)
+    decisions = []  # DECISION_LOG 用
+    fetched = set() # 今回取得できたエントリの ID
     total_entries = 0
+    scorer = load_model() if SCORER_MODE in ("gate", "tiebreak") else None
 
     if not feed_rules:
         feed_rules = [{"url": u, "pass_all": False,
-                       "inc_mode":"add","inc_words":[],
-                       "exc_mode":"add","exc_words":[]} for u in DEFAULT_FEEDS]
+                       "inc_mode":"add","inc_mask":0,
+                       "exc_mode":"add","exc_mask":0} for u in DEFAULT_FEEDS]
         print(f"[info] feeds.txt が無い/空 → デフォルト{len(feed_rules)}本で実行")
 
     for fr in feed_rules:
         url = fr["url"]
         pass_all = fr.get("pass_all", False)
 
-        # inc/exc 決定。ALL時は inc を使わず、exc は活かす
+        # inc/exc 決定（ビット集合）。ALL時は inc を使わず、exc は活かす
+        exc = fr["exc_mask"] if fr["exc_mode"] == "override" else (GLOBAL_EXCLUDE_MASK | fr["exc_mask"])
+        inc_mode = fr.get("inc_mode", "add")
         if pass_all:
-            inc = []
-            exc = fr["exc_words"] if fr["exc_mode"] == "override" else (GLOBAL_EXCLUDE + fr["exc_words"])
+            inc = 0
+        elif inc_mode in ("override", "both"):
+            # both の「GLOBAL_INCLUDE にもヒット」は accept 判定で見るので、ここではフィード固有語のみ
+            inc = fr["inc_mask"]
         else:
-            inc_mode = fr.get("inc_mode", "add")
-            if inc_mode == "override":
-                inc = fr["inc_words"]
-            elif inc_mode == "both":
-                # 両方ヒットは accept 判定で処理するので、ここではフィード固有語のみを保持
-                inc = fr["inc_words"]
-            else:
-                inc = GLOBAL_INCLUDE + fr["inc_words"]
-            exc = fr["exc_words"] if fr["exc_mode"] == "override" else (GLOBAL_EXCLUDE + fr["exc_words"])
+            inc = GLOBAL_INCLUDE_MASK | fr["inc_mask"]
+        stat_mask = GLOBAL_INCLUDE_MASK | fr["inc_mask"]  # 集計用のヒット語
+        scan = inc | exc | stat_mask                       # 1エントリにつき1回だけ走査する語
 
         print(f"[fetch] {url} {'(ALL)' if pass_all else ''}")
         start = time.time()
@@ -206,55 +223,69 @@ def fetch_items(feed_rules: list[dict]):
             total_entries += 1
             title = (e.get("title") or "").strip()
             link  = e.get("link") or ""
-            # RSSの本文/要約（あれば）
-            body = ""
-            if e.get("content") and isinstance(e["content"], list) and e["content"]:
-                body = clean_html(e["content"][0].get("value") or "")
-            if not body:
-                body = clean_html(e.get("summary") or e.get("description") or "")
-
-            hay = f"{title}\n{body}"
-            hay_lc = norm(hay)
+            # RSSの本文/要約（あれば）→ タイトルと合わせて正規化（同一内容はキャッシュ）
+            body = entry_body(e)
+            hay_lc = norm(title, body)
+            if index is not None:
+                fetched.add(item_key({"title": title, "url": link}))
 
             # 受理判定：
             #  - ALL: 除外語だけチェック
             #  - both: GLOBAL_INCLUDE と inc(フィード固有語) の両方にヒット かつ 非除外
             #  - add/override: 従来通り (inc にヒット) かつ 非除外
+            hits = TABLE.match(hay_lc, scan)
             if pass_all:
-                accept = none_hit(hay_lc, exc)
+                inc_ok = True
+            elif inc_mode == "both":
+                inc_ok = bool(hits & GLOBAL_INCLUDE_MASK) and bool(hits & inc)
             else:
-                if fr.get("inc_mode") == "both":
-                    accept = any_hit(hay_lc, GLOBAL_INCLUDE) and any_hit(hay_lc, inc) and none_hit(hay_lc, exc)
-                else:
-                    accept = any_hit(hay_lc, inc) and none_hit(hay_lc, exc)
+                inc_ok = bool(hits & inc)
+            accept = inc_ok and not (hits & exc)
+
+            if DECISION_LOG:
+                decisions.append(f"{int(accept)}\t{_tsv(title)}\t{_tsv(body)}\n")
 
-            if not accept:
+            # tiebreak では「含める語にも除外語にもヒット」した競合だけスコアに回す。
+            # ALL は含める語を見ていない（inc_ok が常に真）ので対象外 = 除外語は常に有効
+            conflict = not pass_all and inc_ok and bool(hits & exc)
+            if not accept and not (scorer is not None and SCORER_MODE == "tiebreak" and conflict):
                 continue
 
-            # 日付
+            # 日付（無ければ None のまま。ItemIndex が初出時刻を割り当てる）
             pub = None
             for key in ("published_parsed", "updated_parsed"):
                 if e.get(key):
                     pub = to_iso(e.get(key))
                     break
-            if not pub:
-                pub = to_iso(None)
 
-            print("APPEND:", title, link)
-
-            items.append({
+            pending.append(({
                 "title": title,
                 "url": link,
                 "source": host_of(link),
                 "published": pub,
-            })
+                "feed": url,
+                "keywords": TABLE.words_of(hits & stat_mask),  # 集計用のヒット語
+            }, hay_lc, accept))
+
+    if DECISION_LOG:
+        with open(DECISION_LOG, "a", encoding="utf-8") as f:
+            f.writelines(decisions)
+
+    items = apply_scorer(pending, scorer)
+    for it in items:
+        print("APPEND:", it["title"], it["url"])
+
+    if index is not None:
+        # 別フィードで採用されたものは残す。取得に失敗したフィードの分は fetched に入らないので消えない
+        now = datetime.now(timezone.utc)
+        rejected = fetched - {item_key(it) for it in items}
+        removed = sum(index.remove(iid, now) for iid in rejected)
+        print(f"[index] 今回不採用 → 削除 {removed}件")
 
-    items.sort(key=lambda x: x["published"], reverse=True)
     print(f"[sum] total_entries={total_entries}, extracted={len(items)}")
-    return items[:MAX_ITEMS]
+    return items
 
-def build_html(items):
-    css = """
+CSS = """
     body{font-family:-apple-system,BlinkMacSystemFont,Segoe UI,Roboto,Helvetica,Arial,"Noto Sans JP",sans-serif;line-height:1.6;margin:20px;}
     header{margin-bottom:16px}
     h1{font-size:1.45rem;margin:0}
@@ -268,14 +299,19 @@ def build_html(items):
     footer{color:#777;font-size:.85rem;margin-top:24px}
     """
 
+def build_html(items, updated: str = "", out: Path | None = None):
+    # items は ItemIndex.latest() / day() の新しい順。並べ替えはしない
+    css = CSS
+
     # 日付ごとにグルーピング
     groups = {}
     for it in items:
         day = iso_to_ymd_jst(it["published"]) or "日付不明"
         groups.setdefault(day, []).append(it)
 
-    # 最終更新表示用（ローカルタイムゾーンで表示）
-    now_str = datetime.now().astimezone().strftime("%Y-%m-%d %H:%M")
+    # 最終更新表示用（インデックスの中身が最後に変わった時刻。同じ入力なら同じ出力）
+    last = datetime.fromisoformat(updated) if updated else datetime.now(timezone.utc)
+    now_str = last.astimezone(JST).strftime("%Y-%m-%d %H:%M")
 
     parts = [
         "<!DOCTYPE html>",
@@ -294,7 +330,7 @@ def build_html(items):
         "</header>",
     ]
 
-    for day in sorted(groups.keys(), reverse=True):
+    for day in groups:  # items が新しい順なので日付も新しい順に並んでいる
         parts.append(f"<div class=\"date\">📅 {day}</div>")
         for it in groups[day]:
             title = html.escape(it["title"] or "(無題)")
@@ -312,27 +348,51 @@ def build_html(items):
         "</body></html>",
     ]
 
-    # HTML文字列を一度作って、index と archive の両方へ書き出し
-    html_text = "\n".join(parts)
-
-    # 最新
-    out = SITE_DIR / "index.html"
-    out.write_text(html_text, encoding="utf-8")
-
-    # アーカイブ（削除なしで貯める）
-    archive_dir = SITE_DIR / "archive"
-    archive_dir.mkdir(parents=True, exist_ok=True)
-    archive_name = datetime.now().strftime("%Y-%m-%d") + ".html"
-    (archive_dir / archive_name).write_text(html_text, encoding="utf-8")
-
-    return out
+    # 仕上げ（CSS外出し・空白詰め）まで済ませて、前回と同じ中身なら書かない
+    out = out or SITE_DIR / "index.html"
+    written = write_page(out, "\n".join(parts), SITE_DIR)
+    return out, written
+
+def build_archive(index: ItemIndex) -> tuple[int, int]:
+    # アーカイブ: JST の1日ごとに index.day() の範囲読みで1ページ（その日に出た記事）。直近 ARCHIVE_DAYS 日分
+    # 最終更新はその日の記事の初出時刻の最大 → 記事が増えない日のページは毎回同じ内容になる
+    today = datetime.now(JST).date()
+    days = written = 0
+    for k in range(ARCHIVE_DAYS):
+        ymd = (today - timedelta(days=k)).isoformat()
+        day_items = index.day(ymd)
+        out = SITE_DIR / "archive" / f"{ymd}.html"
+        if not day_items:
+            if out.exists():
+                out.unlink()  # その日の記事が全部 remove() された
+            continue
+        updated = max(it["first_seen"] for it in day_items)
+        _, w = build_html(day_items, updated, out)
+        days += 1
+        written += w
+    return days, written
 
 def main():
     feeds_path = CONFIG_DIR / "feeds.txt"
     feed_rules = read_feeds_with_rules(feeds_path)
-    items = fetch_items(feed_rules)
-    out = build_html(items)
-    print(f"生成: {out}（{len(items)}件）")
+    index = ItemIndex(INDEX_PATH)
+    items = fetch_items(feed_rules, index)
+
+    # 初出時刻の確定 → インデックスから新しい順に範囲読みしてページ化
+    now = datetime.now(timezone.utc)
+    for it in items:
+        it["published"] = index.add(it, it["published"], now)
+    # 今回採用したものは古くても残す（日付の無いものが消えて「新着」で戻ってくるのを防ぐ）
+    pruned = index.prune(now - timedelta(days=ARCHIVE_DAYS), MAX_ITEMS, {item_key(it) for it in items})
+    index.save()
+    print(f"[index] {len(index)}件（古いものを {pruned}件 削除）")
+    shown = index.latest(MAX_ITEMS)
+    out, written = build_html(shown, index.updated)
+    print(f"生成: {out}（{len(shown)}件 / 今回採用 {len(items)}件）{'' if written else ' 変更なし'}")
+    days, written = build_archive(index)
+    print(f"生成: archive/ {days}日分（直近{ARCHIVE_DAYS}日）うち書き込み {written}")
+    update_and_render(items, STATS_DIR, SITE_DIR, lambda it: iso_to_ymd_jst(it["published"]), css=CSS)
+    optimize_site(SITE_DIR)  # 上で仕上げていないページ（stats.html）の仕上げと不要CSSの掃除
 
 if __name__ == "__main__":
     main()
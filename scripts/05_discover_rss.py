@@ -0,0 +1,278 @@
+# 05_discover_rss.py — RSSが見つかっていない自治体のトップページからフィードを自動で探す
+# ・入力: 1行1サイト "トップページURL | 名前(任意)"。# で始まる行は無視
+# ・<link rel="alternate" type="application/rss+xml|atom+xml"> と、よくあるCMSのパスを候補にする
+# ・候補を実際に取得して feedparser で検証し、応答時間と件数を測る
+# ・同じホストへの同時接続は PER_HOST 本まで（自治体サーバに負荷をかけない）
+#   ホストごとの待ち行列から、空きのあるホストの分だけプールへ渡す。
+#   ワーカーがホストの空き待ちで止まらないので、全体では MAX_WORKERS 本まで並ぶ
+# ・出力は feeds.txt にそのまま貼れる形（計測結果はコメント行）
+#
+# 使い方:
+#   python scripts/05_discover_rss.py sites.txt
+#   python scripts/05_discover_rss.py sites.txt --spec "= 都市計画 用途地域 立地適正化 区画整理 地区計画" -o found.txt
+# 動作確認（ネット不要）:
+#   python scripts/05_discover_rss.py --selftest
+#   fixtures/mock_site/<ホスト名>/ 以下をサイトとみなして discover() を回し、
+#   見つかるフィード・弾くべきページ・1ホストあたりの同時接続数を確かめる
+
+import sys
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import deque
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import feedparser
+
+# よくある自治体CMSのフィード位置（feeds.txt の実績から）
+COMMON_PATHS = [
+    "/news.rss",
+    "/rss.xml",
+    "/cgi-bin/feed.php",
+    "/feed/latest.xml",
+    "/feed/",
+    "/shinchaku/index.rss",
+    "/oshirase/rss.xml",
+    "/articles/index.rss",
+    "/index.rss",
+]
+FEED_TYPES = ("application/rss+xml", "application/atom+xml", "application/rdf+xml")
+
+MAX_WORKERS = 8      # 全体の同時取得数
+PER_HOST = 2         # 1ホストあたりの同時取得数
+TIMEOUT = 6          # 1リクエストのタイムアウト（秒）
+MAX_BYTES = 2_000_000
+USER_AGENT = "Mozilla/5.0 (iwate_news feed discovery)"
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures" / "mock_site"
+
+def run_per_host(pool: ThreadPoolExecutor, jobs: list[tuple], per_host: int = PER_HOST) -> list:
+    """jobs = [(URL, 引数なし関数)] を、1ホストあたり同時 per_host 本までで実行して結果を同じ順で返す。
+    プールに渡すのは今すぐ走れるものだけ（空き待ちでワーカーを塞がない）。"""
+    queues = {}
+    for i, (url, _) in enumerate(jobs):
+        queues.setdefault(urlparse(url).netloc, deque()).append(i)
+    results = [None] * len(jobs)
+    active = dict.fromkeys(queues, 0)
+    running = {}
+
+    def fill():
+        # ホストを順に回して空きの分だけ渡す（最初の一巡でホスト間が交互に並ぶ）
+        for host, q in queues.items():
+            while q and active[host] < per_host:
+                i = q.popleft()
+                active[host] += 1
+                running[pool.submit(jobs[i][1])] = (host, i)
+
+    fill()
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for fut in done:
+            host, i = running.pop(fut)
+            active[host] -= 1
+            results[i] = fut.result()
+        fill()
+    return results
+
+def http_get(url: str, timeout: float = TIMEOUT):
+    """(本文bytes, 最終URL, 所要秒)。失敗時は例外。"""
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        body = resp.read(MAX_BYTES)
+        final = resp.geturl()
+    return body, final, time.perf_counter() - start
+
+class _LinkFinder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "link":
+            return
+        a = {k.lower(): (v or "") for k, v in attrs}
+        rels = a.get("rel", "").lower().split()
+        if "alternate" in rels and a.get("type", "").lower().split(";")[0].strip() in FEED_TYPES and a.get("href"):
+            self.hrefs.append(a["href"].strip())
+
+def find_candidates(page_url: str, page: bytes) -> list[tuple[str, str]]:
+    """トップページ → [(候補URL, 見つけ方)]。<link rel=alternate> を先に、CMS定番パスを後ろに。"""
+    text = page.decode("utf-8", errors="replace")
+    finder = _LinkFinder()
+    try:
+        finder.feed(text)
+    except Exception:
+        pass
+    out, seen = [], set()
+    for href in finder.hrefs:
+        u = urljoin(page_url, href)
+        if u not in seen:
+            seen.add(u)
+            out.append((u, "link"))
+    p = urlparse(page_url)
+    origin = f"{p.scheme}://{p.netloc}"
+    prefix = p.path if p.path.endswith("/") else p.path.rsplit("/", 1)[0] + "/"
+    bases = [origin] if prefix == "/" else [origin, origin + prefix.rstrip("/")]
+    for base in bases:
+        for path in COMMON_PATHS:
+            u = base + path
+            if u not in seen:
+                seen.add(u)
+                out.append((u, "path"))
+    return out
+
+def validate_feed(url: str, how: str, get=http_get) -> dict | None:
+    try:
+        body, final, took = get(url)
+    except Exception:
+        return None
+    d = feedparser.parse(body)
+    if not d.get("version"):
+        return None  # HTML やエラーページ
+    return {
+        "url": final or url,
+        "how": how,
+        "version": d.version,
+        "items": len(d.entries),
+        "latency_ms": int(took * 1000),
+        "title": (d.feed.get("title") or "").strip(),
+    }
+
+def read_sites(path: Path) -> list[tuple[str, str]]:
+    sites = []
+    for line in path.read_text(encoding="utf-8-sig").splitlines():
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        parts = [p.strip() for p in s.split("|")]
+        url = parts[0]
+        name = parts[1] if len(parts) >= 2 else urlparse(url).netloc
+        if url.lower().startswith(("http://", "https://")):
+            sites.append((url, name))
+    return sites
+
+def discover(sites: list[tuple[str, str]], workers: int = MAX_WORKERS, per_host: int = PER_HOST,
+             get=http_get) -> dict[str, list[dict]]:
+    """サイトごとの有効フィード（件数の多い順）。get を差し替えればネット無しで試せる。"""
+    def fetch_home(url):
+        try:
+            body, final, _ = get(url)
+        except Exception as e:
+            print(f"[error] {url} → {e}", file=sys.stderr)
+            return []
+        return find_candidates(final or url, body)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # 1) トップページをまとめて取得 → 候補URL
+        cands = run_per_host(pool, [(u, lambda u=u: fetch_home(u)) for u, _ in sites], per_host)
+        # 2) 全候補をまとめて検証（ホストごとの上限は run_per_host が守る）
+        owners = [i for i, cs in enumerate(cands) for _ in cs]
+        results = run_per_host(pool, [(u, lambda u=u, how=how: validate_feed(u, how, get))
+                                      for cs in cands for u, how in cs], per_host)
+    found = {name: [] for _, name in sites}
+    seen = set()
+    for i, r in zip(owners, results):
+        if r and (i, r["url"]) not in seen:
+            seen.add((i, r["url"]))
+            found[sites[i][1]].append(r)
+    for rs in found.values():
+        rs.sort(key=lambda r: (r["how"] != "link", -r["items"], r["latency_ms"]))
+    return found
+
+def to_feeds_lines(found: dict[str, list[dict]], spec: str = "") -> list[str]:
+    lines = []
+    for name, rs in found.items():
+        if not rs:
+            lines.append(f"# {name}なし")
+            continue
+        for r in rs:
+            lines.append(f"# {name}: {r['title'] or '-'} items={r['items']} {r['latency_ms']}ms ({r['how']}, {r['version']})")
+            lines.append(f"{r['url']} | {spec}" if spec else r["url"])
+    return lines
+
+class FixtureGet:
+    """fixtures/mock_site/<host>/<path> を返す http_get の代わり。ホストごとの同時接続数の最大値を記録する。"""
+
+    def __init__(self, root: Path = FIXTURE_DIR, delay: float = 0.02):
+        self.root = root
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+
+    def __call__(self, url: str, timeout: float = TIMEOUT):
+        p = urlparse(url)
+        host = p.netloc
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        try:
+            time.sleep(self.delay)  # 重なりが起きるよう少し待つ
+            rel = p.path.lstrip("/")
+            if not rel or rel.endswith("/"):
+                rel += "index.html"
+            f = self.root / host / rel
+            if not f.is_file():
+                raise urllib.error.HTTPError(url, 404, "Not Found", None, None)
+            return f.read_bytes(), url, self.delay
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+def selftest() -> bool:
+    sites = read_sites(FIXTURE_DIR / "sites.txt")
+    get = FixtureGet()
+    found = discover(sites, workers=MAX_WORKERS, per_host=PER_HOST, get=get)
+    got = {name: [(urlparse(r["url"]).path, r["how"], r["items"]) for r in rs] for name, rs in found.items()}
+    expected = {
+        "アルファ町": [("/oshirase/rss.xml", "link", 2)],  # <link rel=alternate>（定番パスと重複しても1件）
+        "ベータ村": [("/cgi-bin/feed.php", "path", 3)],     # CMS定番パス
+        "ガンマ町": [],                                      # /news.rss は HTML の 404 ページ → 不採用
+    }
+    ok = True
+    for name, want in expected.items():
+        mark = "ok" if got.get(name) == want else "NG"
+        ok &= mark == "ok"
+        print(f"[{mark}] {name}: {got.get(name)}")
+    peak = max(get.peak.values())
+    mark = "ok" if peak <= PER_HOST else "NG"
+    ok &= mark == "ok"
+    print(f"[{mark}] 1ホストあたりの同時接続 最大 {peak}（上限 {PER_HOST}）")
+    return ok
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="自治体トップページから RSS/Atom を探して feeds.txt 行を出す")
+    ap.add_argument("sites", type=Path, nargs="?", help="1行1サイト: URL | 名前")
+    ap.add_argument("--spec", default="", help="feeds.txt の2列目以降（例: \"= 都市計画 用途地域\"）")
+    ap.add_argument("--workers", type=int, default=MAX_WORKERS)
+    ap.add_argument("--per-host", type=int, default=PER_HOST)
+    ap.add_argument("-o", "--output", type=Path)
+    ap.add_argument("--selftest", action="store_true", help="fixtures/mock_site で動作確認して終わる")
+    args = ap.parse_args(argv)
+
+    if args.selftest:
+        sys.exit(0 if selftest() else 1)
+    if args.sites is None:
+        ap.error("sites を指定してください")
+
+    sites = read_sites(args.sites)
+    print(f"[info] {len(sites)} サイトを探索（同時 {args.workers} / 1ホスト {args.per_host}）", file=sys.stderr)
+    start = time.time()
+    found = discover(sites, workers=args.workers, per_host=args.per_host)
+    hits = sum(1 for rs in found.values() if rs)
+    print(f"[sum] 見つかった {hits}/{len(sites)} サイト {time.time() - start:.1f}s", file=sys.stderr)
+
+    text = "\n".join(to_feeds_lines(found, args.spec)) + "\n"
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+        print(f"生成: {args.output}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+
+if __name__ == "__main__":
+    main()
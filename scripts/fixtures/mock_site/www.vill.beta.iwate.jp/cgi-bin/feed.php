@@ -0,0 +1,6 @@
+<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0"><channel><title>ベータ村</title><link>http://www.vill.beta.iwate.jp/</link>
+<item><title>空き家バンク登録物件</title><link>http://www.vill.beta.iwate.jp/a/1.html</link></item>
+<item><title>村有地の売却</title><link>http://www.vill.beta.iwate.jp/a/2.html</link></item>
+<item><title>用途地域の見直し</title><link>http://www.vill.beta.iwate.jp/a/3.html</link></item>
+</channel></rss>
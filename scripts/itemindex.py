@@ -0,0 +1,146 @@
+# itemindex.py — 採用アイテムの永続インデックス（初出時刻の固定 + 時刻順の範囲読み）
+# ・キー = 正規化したリンク（utm_* やフラグメントを除く）。リンクが無いときはタイトルの内容ハッシュ
+# ・日付の無いエントリは「初めて見た時刻」を記録し、以後の実行でも同じ時刻を使う
+#   （毎日トップに戻ってくる / 毎回全ページが変わる、を防ぐ）
+# ・(時刻, ID) の昇順リストを bisect で保つ。挿入位置の探索は O(log n) だが、list への挿入・削除は
+#   要素の移動で O(n)（memmove なので数万件規模なら1件数μs〜）。日単位の読み出しは二分探索 + 範囲読み
+#   → ページ生成時に全件ソートし直さない。同じ入力なら同じ並び・同じ出力になる
+# ・今回取得したのに規則で落ちたエントリは remove() で消す（除外語を足せば過去分からも消える）
+# ・prune() で古いものを落とす（新しい方の keep 件と since 以降は残す）→ ファイルが増え続けない
+# ・CI（pages.yml）では data/item_index.json を actions/cache で実行間に持ち回す
+#
+# data/item_index.json:
+#   {"updated": 最後に中身が変わった時刻, "items": [[時刻ISO, ID, {title,url,source,first_seen,hash}], ...]}
+
+import json
+import hashlib
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from pathlib import Path
+
+from textnorm import norm
+
+JST = timezone(timedelta(hours=9))
+
+def canonical_link(url: str) -> str:
+    p = urlsplit((url or "").strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(p.query, keep_blank_values=True)
+                       if not k.lower().startswith("utm_")])
+    return urlunsplit((p.scheme.lower(), p.netloc.lower(), p.path or "/", query, ""))
+
+def content_hash(title: str) -> str:
+    return hashlib.blake2b(norm(title).encode("utf-8"), digest_size=8).hexdigest()
+
+def _iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat()
+
+def item_key(it: dict) -> str:
+    """インデックス上の ID（正規化リンク、無ければタイトルの内容ハッシュ）。"""
+    key = canonical_link(it["url"]) if it.get("url") else "content:" + content_hash(it.get("title") or "")
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+def day_bounds(ymd: str) -> tuple[str, str]:
+    """JST の1日 → UTC ISO の [開始, 終了)。"""
+    start = datetime.fromisoformat(ymd).replace(tzinfo=JST)
+    return _iso(start), _iso(start + timedelta(days=1))
+
+class ItemIndex:
+    def __init__(self, path: Path):
+        self.path = path
+        self.order = []    # [(時刻ISO, ID)] 昇順
+        self.recs = {}     # ID → レコード
+        self.updated = ""
+        self.dirty = False
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.updated = data.get("updated", "")
+            for t, iid, rec in data.get("items", []):
+                self.order.append((t, iid))  # 保存時に昇順なのでそのまま
+                self.recs[iid] = rec
+
+    def __len__(self):
+        return len(self.order)
+
+    def add(self, it: dict, published: str | None, now: datetime) -> str:
+        """アイテムを登録し、表示に使う時刻を返す。published が無ければ初出時刻。"""
+        h = content_hash(it.get("title") or "")
+        iid = item_key(it)
+        rec = self.recs.get(iid)
+        if rec is None:
+            rec = {"first_seen": _iso(now)}
+            old_t = None
+        else:
+            old_t = rec["time"]
+        t = published or rec["first_seen"]
+        new = {
+            "title": it.get("title") or "",
+            "url": it.get("url") or "",
+            "source": it.get("source") or "",
+            "first_seen": rec["first_seen"],
+            "hash": h,
+            "time": t,
+        }
+        if new == rec:
+            return t
+        if old_t != t:
+            if old_t is not None:
+                del self.order[bisect_left(self.order, (old_t, iid))]
+            insort(self.order, (t, iid))
+        self.recs[iid] = new
+        self.updated = _iso(now)
+        self.dirty = True
+        return t
+
+    def remove(self, iid: str, now: datetime | None = None) -> bool:
+        """ID のレコードを消す（無ければ何もしない）。表示中のページが変わるので updated も進める。"""
+        rec = self.recs.pop(iid, None)
+        if rec is None:
+            return False
+        del self.order[bisect_left(self.order, (rec["time"], iid))]
+        self.updated = _iso(now or datetime.now(timezone.utc))
+        self.dirty = True
+        return True
+
+    def prune(self, since: datetime, keep: int, protect=()) -> int:
+        """時刻が since より前で、新しい方から keep 件にも入らないものを落とす（protect の ID は残す）。
+        落ちるのはどのページにも出ていないものだけなので updated は変えない。"""
+        cut = min(bisect_left(self.order, (_iso(since),)), max(0, len(self.order) - keep))
+        old = self.order[:cut]
+        kept = [(t, iid) for t, iid in old if iid in protect]  # 元の順のまま = 昇順を保つ
+        if len(kept) == cut:
+            return 0
+        for t, iid in old:
+            if iid not in protect:
+                del self.recs[iid]
+        self.order[:cut] = kept
+        self.dirty = True
+        return cut - len(kept)
+
+    def _items(self, lo: int, hi: int, newest_first: bool):
+        rng = range(hi - 1, lo - 1, -1) if newest_first else range(lo, hi)
+        for i in rng:
+            t, iid = self.order[i]
+            rec = self.recs[iid]
+            yield {"title": rec["title"], "url": rec["url"], "source": rec["source"], "published": t,
+                   "first_seen": rec["first_seen"]}
+
+    def latest(self, n: int) -> list[dict]:
+        """新しい順に n 件（末尾からの範囲読み）。"""
+        return list(self._items(max(0, len(self.order) - n), len(self.order), True))
+
+    def day(self, ymd: str, newest_first: bool = True) -> list[dict]:
+        """JST の1日分（二分探索で範囲を決めて読むだけ）。"""
+        start, end = day_bounds(ymd)
+        lo = bisect_left(self.order, (start,))
+        hi = bisect_left(self.order, (end,))
+        return list(self._items(lo, hi, newest_first))
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"updated": self.updated,
+                "items": [[t, iid, self.recs[iid]] for t, iid in self.order]}
+        self.path.write_text(json.dumps(data, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        self.dirty = False
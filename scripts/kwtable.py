@@ -0,0 +1,65 @@
+# kwtable.py — キーワードの共有テーブル（1語1回だけ正規化して整数IDを振る）
+# ・フィードごとの語リストは「ID のビット集合」（Python の int）で持つ → フィードが増えても語は増えない
+# ・add / override / both は int の | と & で組み立て、判定も bits & mask の1演算
+# ・match() はヒットした語のビット集合を返す（集計用の語もここから引ける）
+
+from textnorm import fold
+
+class KeywordTable:
+    def __init__(self):
+        self.words = []    # ID → 正規化済みの語
+        self.ids = {}      # 正規化済みの語 → ID
+        self._scan = {}    # mask → そのマスクに含まれる (ID, 語) の列（走査用キャッシュ）
+
+    def intern(self, word: str) -> int | None:
+        w = fold(word)
+        if not w:
+            return None
+        i = self.ids.get(w)
+        if i is None:
+            i = self.ids[w] = len(self.words)
+            self.words.append(w)
+        return i
+
+    def mask(self, words) -> int:
+        """語の列 → ビット集合。"""
+        bits = 0
+        for w in words:
+            i = self.intern(w)
+            if i is not None:
+                bits |= 1 << i
+        return bits
+
+    def ids_of(self, mask: int) -> tuple:
+        scan = self._scan.get(mask)
+        if scan is None:
+            scan = []
+            m, i = mask, 0
+            while m:
+                if m & 1:
+                    scan.append((i, self.words[i]))
+                m >>= 1
+                i += 1
+            scan = self._scan[mask] = tuple(scan)
+        return scan
+
+    def match(self, text_lc: str, mask: int) -> int:
+        """text_lc（norm 済み）に含まれる語のうち mask にあるもののビット集合。"""
+        hits = 0
+        for i, w in self.ids_of(mask):
+            if w in text_lc:
+                hits |= 1 << i
+        return hits
+
+    def words_of(self, bits: int) -> list[str]:
+        # 結果のビット集合は毎回違うのでキャッシュしない
+        out, i = [], 0
+        while bits:
+            if bits & 1:
+                out.append(self.words[i])
+            bits >>= 1
+            i += 1
+        return out
+
+# 全フィード・全サイトで共有する表
+TABLE = KeywordTable()
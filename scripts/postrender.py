@@ -0,0 +1,164 @@
+# postrender.py — site/ のページの仕上げ（04 はページ生成時に write_page() で仕上げて書く / 最後に optimize_site()）
+# ・HTML の空白の連続を1個に詰める（<pre> / <textarea> / <script> の中は触らない）
+# ・<style> を assets/style.<内容ハッシュ>.css に出して <link> に置き換え（同じCSSは1ファイルを共有）
+# ・IWATE_PRECOMPRESS=gz,br を指定したときだけ、各ページの .gz（と brotli があれば .br）と _headers を置く
+# ・仕上げた結果がディスク上と同じなら書かない（mtime も変えない）。
+#   マニフェスト（data/postrender.json）に仕上げ済みの内容ハッシュを持ち、読み直し・仕上げ直しも省く
+# ・ファイル単位でスレッド並列（zlib / brotli は圧縮中 GIL を離す）
+#
+# 注: GitHub Pages は .gz/.br を配信に使わず Cache-Control も付けられない（成果物が増えるだけ）ので既定は無効。
+#     .gz/.br と _headers（assets/ の長期キャッシュ指定。Cloudflare Pages / Netlify 形式）は
+#     それらを使うホストへ出すときだけ有効にする。無効時は以前の実行で作ったものを消す。
+#
+# 単体実行: python scripts/postrender.py [site_dir]
+
+import os
+import re
+import sys
+import json
+import gzip
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # 無ければ .gz のみ
+    brotli = None
+
+ROOT = Path(os.getenv("IWATE_ROOT", ".")).resolve()
+MANIFEST_PATH = ROOT / "data" / "postrender.json"
+ASSET_DIR_NAME = "assets"
+MAX_WORKERS = min(8, (os.cpu_count() or 2))
+# 事前圧縮の形式（例: "gz,br"）。既定は空 = 作らない
+PRECOMPRESS = [f.strip() for f in os.getenv("IWATE_PRECOMPRESS", "").split(",") if f.strip()]
+HEADERS = f"""/{ASSET_DIR_NAME}/*
+  Cache-Control: public, max-age=31536000, immutable
+"""
+
+_STYLE_RE = re.compile(r"<style>(.*?)</style>", re.S | re.I)
+_KEEP_RE = re.compile(r"(<(pre|textarea|script)\b.*?</\2\s*>)", re.S | re.I)
+_SPACE_RE = re.compile(r"\s+")
+_CSS_SPACE_RE = re.compile(r"\s*([{};:,>])\s*")
+_ASSET_RE = re.compile(r'<link rel="stylesheet" href="[^"]*/(style\.[0-9a-f]{10}\.css)">')
+
+def minify_css(css: str) -> str:
+    css = " ".join(css.split())
+    css = _CSS_SPACE_RE.sub(r"\1", css)
+    return css.replace(";}", "}").strip()
+
+def minify_html(text: str) -> str:
+    # 空白の連続は消さずに1個へ（インライン要素間の空白は表示に効く）。pre/textarea/script はそのまま
+    out = []
+    pos = 0
+    for m in _KEEP_RE.finditer(text):
+        out.append(_SPACE_RE.sub(" ", text[pos:m.start()]))
+        out.append(m.group(1))
+        pos = m.end()
+    out.append(_SPACE_RE.sub(" ", text[pos:]))
+    return "".join(out).strip()
+
+def _sha(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _write_if_changed(path: Path, data: bytes) -> bool:
+    if path.exists() and path.read_bytes() == data:
+        return False
+    path.write_bytes(data)
+    return True
+
+def extract_css(text: str, page: Path, site_dir: Path) -> tuple[str, list[str]]:
+    """<style> → 指紋付き CSS ファイルへの <link>。戻り値: (置換後HTML, 使った asset 名)。"""
+    assets = []
+
+    def repl(m):
+        css = minify_css(m.group(1)).encode("utf-8")
+        name = f"style.{_sha(css)[:10]}.css"
+        asset = site_dir / ASSET_DIR_NAME / name
+        if not asset.exists():
+            asset.parent.mkdir(parents=True, exist_ok=True)
+            asset.write_bytes(css)
+            _compress(asset, css)
+        assets.append(name)
+        href = os.path.relpath(asset, page.parent).replace(os.sep, "/")
+        return f'<link rel="stylesheet" href="{href}">'
+
+    return _STYLE_RE.sub(repl, text), assets
+
+def _compress(path: Path, data: bytes):
+    if "gz" in PRECOMPRESS:
+        _write_if_changed(path.with_name(path.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+    if "br" in PRECOMPRESS and brotli is not None:
+        _write_if_changed(path.with_name(path.name + ".br"), brotli.compress(data, quality=11))
+
+def _sidecars_ok(path: Path) -> bool:
+    if "gz" in PRECOMPRESS and not path.with_name(path.name + ".gz").exists():
+        return False
+    if "br" in PRECOMPRESS and brotli is not None and not path.with_name(path.name + ".br").exists():
+        return False
+    return True
+
+def finish_html(text: str, page: Path, site_dir: Path) -> bytes:
+    """CSS 外出し + 空白詰め。仕上げ済みのページに掛けても同じ結果になる。"""
+    text, _ = extract_css(text, page, site_dir)
+    return minify_html(text).encode("utf-8")
+
+def write_page(page: Path, text: str, site_dir: Path) -> bool:
+    """生成した HTML を仕上げてから書く。中身が同じなら書かない（戻り値: 書いたか）。"""
+    page.parent.mkdir(parents=True, exist_ok=True)
+    return _write_if_changed(page, finish_html(text, page, site_dir))
+
+def process_page(page: Path, site_dir: Path, prev: dict | None) -> tuple[dict, bool]:
+    raw = page.read_bytes()
+    h = _sha(raw)
+    if prev and prev.get("sha") == h and _sidecars_ok(page):
+        return prev, False  # 前回仕上げたまま
+    # write_page() 済みなら out == raw で書き込みは起きない
+    out = finish_html(raw.decode("utf-8"), page, site_dir)
+    changed = _write_if_changed(page, out)
+    _compress(page, out)
+    # 使っている CSS は仕上げ後の <link> から拾う（仕上げ済みのページには <style> が無い）
+    css = _ASSET_RE.findall(out.decode("utf-8"))
+    return {"sha": _sha(out), "size": len(out), "css": css}, changed
+
+def optimize_site(site_dir: Path, manifest_path: Path = MANIFEST_PATH) -> dict:
+    manifest = {}
+    if manifest_path.exists():
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    pages = sorted(p for p in site_dir.rglob("*.html") if ASSET_DIR_NAME not in p.relative_to(site_dir).parts)
+
+    def job(p):
+        rel = p.relative_to(site_dir).as_posix()
+        return rel, process_page(p, site_dir, manifest.get(rel))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        results = list(pool.map(job, pages))
+
+    new_manifest = {rel: entry for rel, (entry, _) in results}
+    changed = sum(1 for _, (_, ch) in results if ch)
+
+    # どのページからも参照されなくなった CSS を掃除
+    used = {a for e in new_manifest.values() for a in e.get("css", [])}
+    asset_dir = site_dir / ASSET_DIR_NAME
+    if asset_dir.exists():
+        for f in asset_dir.glob("style.*.css*"):
+            if f.name.split(".css")[0] + ".css" not in used:
+                f.unlink()
+    if PRECOMPRESS:
+        _write_if_changed(site_dir / "_headers", HEADERS.encode("utf-8"))
+    else:
+        # 無効時は過去に作った .gz/.br/_headers を成果物に残さない
+        for f in [site_dir / "_headers", *site_dir.rglob("*.gz"), *site_dir.rglob("*.br")]:
+            if f.is_file():
+                f.unlink()
+
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(new_manifest, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+    size = sum(e["size"] for e in new_manifest.values())
+    formats = [f for f in PRECOMPRESS if f != "br" or brotli is not None]
+    print(f"[post] pages={len(pages)} rewritten={changed} html {size/1024:.0f}KiB"
+          f" precompress={','.join(formats) or '-'}")
+    return new_manifest
+
+if __name__ == "__main__":
+    optimize_site(Path(sys.argv[1]) if len(sys.argv) > 1 else ROOT / "site")
@@ -0,0 +1,183 @@
+# relevance.py — 文字 n-gram ハッシュ特徴 + ロジスティック回帰の関連度スコア（任意機能）
+# ・キーワード規則（04 の GLOBAL_INCLUDE / GLOBAL_EXCLUDE / feeds.txt）の補助として使う
+# ・特徴は textnorm.norm 済みテキストの文字 2/3-gram を 2^BITS 個のバケツへハッシュ
+# ・重みは NumPy 配列1本（config/relevance_model.npz）。1回の実行分をまとめて bincount で採点
+# ・numpy が無い / モデルが無いときは load_model() が None を返し、規則だけで動く
+#
+# 学習（オフライン）:
+#   python scripts/relevance.py train config/relevance_train.tsv
+#   TSV 1行 = ラベル(1=採用 / 0=不採用) <TAB> タイトル <TAB> 本文(任意)
+#   （04 を IWATE_DECISION_LOG=path 付きで回すと規則判定の結果が同じ形式で出るので、
+#     それを人手で直したものを学習データにする）
+# 評価:
+#   python scripts/relevance.py eval config/relevance_train.tsv
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # numpy 無しでも 04 は規則だけで動く
+    np = None
+
+from textnorm import norm
+
+ROOT = Path(os.getenv("IWATE_ROOT", ".")).resolve()
+MODEL_PATH = ROOT / "config" / "relevance_model.npz"
+
+BITS = 18           # 特徴次元 = 2^18
+NGRAMS = (2, 3)     # 文字 n-gram
+THRESHOLD = 0.5     # 採用とみなす確率
+
+def _features(texts: list[str]):
+    """texts → (doc, bucket, val)。doc 番目の文書に bucket の特徴が val の重みで立つ（疎行列の COO 形式）。"""
+    n_docs = len(texts)
+    # \0 区切りで1本につなぎ、コードポイント列として一括でハッシュする
+    joined = "\0".join(t.replace("\0", " ") for t in texts)
+    cp = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    is_sep = cp == 0
+    doc_of = np.cumsum(is_sep)                     # 各位置の文書番号
+    sep_cs = np.concatenate(([0], np.cumsum(is_sep)))
+    mask = np.uint64((1 << BITS) - 1)
+
+    docs, buckets = [], []
+    for n in NGRAMS:
+        m = len(cp) - n + 1
+        if m <= 0:
+            continue
+        ok = (sep_cs[n:n + m] - sep_cs[:m]) == 0   # 区切りをまたぐ n-gram は捨てる
+        h = np.full(m, np.uint64(n * 0x9E3779B1))
+        for k in range(n):
+            h = h * np.uint64(1000003) + cp[k:k + m]
+        # 下位ビットが偏らないよう splitmix64 風に混ぜる
+        h ^= h >> np.uint64(31)
+        h *= np.uint64(0xBF58476D1CE4E5B9)
+        h ^= h >> np.uint64(29)
+        docs.append(doc_of[:m][ok])
+        buckets.append((h[ok] & mask).astype(np.int64))
+
+    if docs:
+        doc = np.concatenate(docs).astype(np.int64)
+        bucket = np.concatenate(buckets)
+    else:
+        doc = np.zeros(0, dtype=np.int64)
+        bucket = np.zeros(0, dtype=np.int64)
+    # 長い本文ほど有利にならないよう 1/sqrt(n-gram数) で正規化
+    counts = np.bincount(doc, minlength=n_docs).astype(np.float32)
+    scale = 1.0 / np.sqrt(np.maximum(counts, 1.0))
+    return doc, bucket, scale[doc], n_docs
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30.0, 30.0)))
+
+class RelevanceModel:
+    def __init__(self, weights, bias: float = 0.0):
+        self.weights = weights
+        self.bias = float(bias)
+
+    def score(self, texts: list[str]):
+        """norm 済みテキスト列 → 採用確率の配列（全件まとめて1回で計算）。"""
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        doc, bucket, val, n_docs = _features(texts)
+        z = np.bincount(doc, weights=self.weights[bucket] * val, minlength=n_docs) + self.bias
+        return _sigmoid(z)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, weights=self.weights.astype(np.float32),
+                            bias=np.float32(self.bias), bits=BITS, ngrams=np.array(NGRAMS))
+
+def load_model(path: Path = MODEL_PATH):
+    """モデルを読み込む。numpy 無し / ファイル無し / 形式違いなら None。"""
+    if np is None:
+        print("[info] numpy が無いため関連度スコアは無効（規則のみで判定）")
+        return None
+    if not path.exists():
+        print(f"[info] {path} が無いため関連度スコアは無効（規則のみで判定）")
+        return None
+    with np.load(path) as z:
+        if int(z["bits"]) != BITS or tuple(z["ngrams"].tolist()) != NGRAMS:
+            print(f"[warn] {path} の特徴設定が現行と違うため無視します（再学習してください）")
+            return None
+        return RelevanceModel(z["weights"].astype(np.float32), float(z["bias"]))
+
+def train(texts: list[str], labels: list[int], epochs: int = 300, lr: float = 0.5, l2: float = 1e-5):
+    """全件バッチの AdaGrad でロジスティック回帰を学習。クラス比の偏りは重みで補正。"""
+    doc, bucket, val, n_docs = _features(texts)
+    y = np.asarray(labels, dtype=np.float64)
+    pos = max(y.sum(), 1.0)
+    neg = max(n_docs - y.sum(), 1.0)
+    sample_w = np.where(y > 0, n_docs / (2 * pos), n_docs / (2 * neg))
+
+    dim = 1 << BITS
+    w = np.zeros(dim, dtype=np.float64)
+    b = 0.0
+    gw_acc = np.full(dim, 1e-8)
+    gb_acc = 1e-8
+    for _ in range(epochs):
+        p = _sigmoid(np.bincount(doc, weights=w[bucket] * val, minlength=n_docs) + b)
+        g = (p - y) * sample_w / n_docs
+        gw = np.bincount(bucket, weights=g[doc] * val, minlength=dim) + l2 * w
+        gb = g.sum()
+        gw_acc += gw * gw
+        gb_acc += gb * gb
+        w -= lr * gw / np.sqrt(gw_acc)
+        b -= lr * gb / np.sqrt(gb_acc)
+    return RelevanceModel(w.astype(np.float32), b)
+
+def read_labeled_tsv(path: Path):
+    texts, labels = [], []
+    for line in path.read_text(encoding="utf-8-sig").splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        cols = line.split("\t")
+        if len(cols) < 2 or cols[0].strip() not in ("0", "1"):
+            continue
+        title = cols[1].strip()
+        body = cols[2].strip() if len(cols) >= 3 else ""
+        texts.append(norm(title, body))
+        labels.append(int(cols[0]))
+    return texts, labels
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="関連度スコアの学習・評価")
+    ap.add_argument("command", choices=["train", "eval"])
+    ap.add_argument("tsv", type=Path)
+    ap.add_argument("--model", type=Path, default=MODEL_PATH)
+    ap.add_argument("--epochs", type=int, default=300)
+    args = ap.parse_args(argv)
+
+    if np is None:
+        sys.exit("numpy が必要です: pip install numpy")
+    texts, labels = read_labeled_tsv(args.tsv)
+    if not texts:
+        sys.exit(f"{args.tsv} に学習データがありません")
+    print(f"[info] {args.tsv} から {len(texts)} 件（採用 {sum(labels)} / 不採用 {len(labels) - sum(labels)}）")
+
+    if args.command == "train":
+        start = time.time()
+        model = train(texts, labels, epochs=args.epochs)
+        model.save(args.model)
+        print(f"[train] {time.time() - start:.1f}s → {args.model}")
+    else:
+        model = load_model(args.model)
+        if model is None:
+            sys.exit(1)
+
+    start = time.perf_counter()
+    scores = model.score(texts)
+    took = (time.perf_counter() - start) * 1000
+    pred = scores >= THRESHOLD
+    y = np.asarray(labels, dtype=bool)
+    tp = int((pred & y).sum()); fp = int((pred & ~y).sum()); fn = int((~pred & y).sum())
+    acc = float((pred == y).mean())
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    print(f"[{args.command}] acc={acc:.3f} precision={prec:.3f} recall={rec:.3f} scored={len(texts)} in {took:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# textnorm.py — 見出し・本文の正規化（02 / 03 / 04 共通）
+# ・タグ除去 / 実体参照デコード / 空白の畳み込みを 1 回の走査で行う
+# ・<script> / <style> の中身は捨てる
+# ・判定用テキストは NFKC + casefold（キーワード側も fold() で同じ形にそろえる）
+# ・Yahoo 系で同じ見出しが何度も流れてくるので、内容ハッシュをキーにした LRU で使い回す
+
+import re
+import html
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+CACHE_SIZE = 4096  # 1キャッシュあたりの上限件数
+
+# 1トークン = script/style ブロック | コメント | タグ | 実体参照 | 空白 | 通常テキスト | 単独の < &
+_TOKEN_RE = re.compile(
+    r"<(script|style)\b.*?</\1\s*>"
+    r"|<!--.*?-->"
+    r"|<[^>]+>"
+    r"|&(?:#[0-9]+|#[xX][0-9a-fA-F]+|[A-Za-z][A-Za-z0-9]*);?"
+    r"|\s+"
+    r"|[^<&\s]+"
+    r"|[<&]",
+    re.S | re.I,
+)
+
+class _LRU:
+    """内容ハッシュ(blake2b 128bit)をキーにした上限付きキャッシュ。"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts: str) -> bytes:
+        h = hashlib.blake2b(digest_size=16)
+        for p in parts:
+            h.update(p.encode("utf-8", "surrogatepass"))
+            h.update(b"\0")
+        return h.digest()
+
+    def get(self, k: bytes):
+        v = self.data.get(k)
+        if v is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(k)
+        self.hits += 1
+        return v
+
+    def put(self, k: bytes, v: str) -> str:
+        self.data[k] = v
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+        return v
+
+    def clear(self):
+        self.data.clear()
+        self.hits = self.misses = 0
+
+_clean_cache = _LRU()
+_norm_cache = _LRU()
+
+def _scan(s: str) -> str:
+    # 二重エスケープ(&lt;p&gt;...)は従来どおり先にデコードしてからタグとして落とす。
+    # その場合デコードはここで1回きり（ループ側で & をもう一度解釈しない）
+    decode = True
+    if "&lt;" in s:
+        s = html.unescape(s)
+        decode = False
+    # タグもデコード対象の実体参照も無ければ空白の畳み込みだけ
+    if "<" not in s and not (decode and "&" in s):
+        return " ".join(s.split())
+
+    out = []
+    space = False
+    for m in _TOKEN_RE.finditer(s):
+        tok = m.group()
+        c = tok[0]
+        if c == "<" and len(tok) > 1:
+            continue  # タグ / コメント / script / style
+        if c == "&" and len(tok) > 1 and decode:
+            tok = html.unescape(tok)
+        if tok.isspace():
+            space = True
+            continue
+        if space and out:
+            out.append(" ")
+        space = False
+        out.append(tok)
+    return "".join(out)
+
+def clean_html(s: str) -> str:
+    """HTML断片 → 表示用テキスト（タグ除去・実体参照デコード・空白1個に畳み込み）。"""
+    if not s:
+        return ""
+    k = _LRU.key(s)
+    v = _clean_cache.get(k)
+    if v is None:
+        v = _clean_cache.put(k, _scan(s))
+    return v
+
+def fold(s: str) -> str:
+    """全角/半角・互換文字を NFKC で統一して casefold（キーワード側の正規化用）。"""
+    return unicodedata.normalize("NFKC", s or "").casefold()
+
+def norm_words(words) -> list[str]:
+    """キーワード列を fold() して空語と重複を落とす（順序は維持）。"""
+    seen, out = set(), []
+    for w in words:
+        w = fold(w)
+        if w and w not in seen:
+            seen.add(w)
+            out.append(w)
+    return out
+
+def norm(*parts: str) -> str:
+    """clean 済みテキスト(タイトル, 本文…)を改行で連結し fold() した判定用文字列。"""
+    k = _LRU.key(*parts)
+    v = _norm_cache.get(k)
+    if v is None:
+        v = _norm_cache.put(k, fold("\n".join(p for p in parts if p)))
+    return v
+
+def entry_body(entry) -> str:
+    """RSSエントリの本文候補 content[0].value → summary/description を表示用テキストで返す。"""
+    body = ""
+    if entry.get("content") and isinstance(entry["content"], list) and entry["content"]:
+        body = clean_html(entry["content"][0].get("value") or "")
+    if not body:
+        body = clean_html(entry.get("summary") or entry.get("description") or "")
+    return body
+
+def cache_info() -> dict:
+    return {
+        "clean": (_clean_cache.hits, _clean_cache.misses, len(_clean_cache.data)),
+        "norm": (_norm_cache.hits, _norm_cache.misses, len(_norm_cache.data)),
+    }
+
+# ==== ベンチマーク（python scripts/textnorm.py）====
+def _legacy(title: str, raw: str) -> str:
+    body = re.sub(r"<[^>]+>", "", html.unescape(raw or ""))
+    return unicodedata.normalize("NFKC", f"{title}\n{body}").lower()
+
+def _bench(n_entries: int = 2000, n_unique: int = 300):
+    import time
+    import tracemalloc
+
+    samples = []
+    for i in range(n_unique):
+        title = f"盛岡市　中心市街地の再開発　第{i}回ＰＦＩ説明会"
+        raw = (
+            f"<p>盛岡市は&nbsp;<b>再開発</b>事業について&lt;br&gt;説明会を開催します。</p>"
+            f"<script>var x={i};</script><p>対象: 用途地域 &amp; 区画整理 No.{i}</p>\n\n"
+        )
+        samples.append((title, {"summary": raw}))
+    entries = [samples[i % n_unique] for i in range(n_entries)]
+
+    def run_legacy():
+        return [_legacy(t, e["summary"]) for t, e in entries]
+
+    def run_new():
+        return [norm(t, entry_body(e)) for t, e in entries]
+
+    for name, fn in (("legacy", run_legacy), ("textnorm", run_new)):
+        _clean_cache.clear()
+        _norm_cache.clear()
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        fn()
+        took = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[bench] {name:8s} entries={n_entries} {took*1000:.1f}ms peak={peak/1024:.0f}KiB ({peak/n_entries:.0f}B/entry)")
+    print(f"[bench] cache {cache_info()}")
+
+if __name__ == "__main__":
+    _bench()
@@ -0,0 +1,271 @@
+# trendstats.py — 採用アイテムの集計（日別 / キーワード / フィード / 出典ホスト）を差分で積み上げる
+# ・site/archive/*.html は読まない。集計は data/stats/ の列ファイルだけで完結
+# ・1回の実行で増えるのは「今回初めて見たアイテム」の分だけ（集計済みIDは seen.u64 に保持）
+# ・04 から update_and_render() を呼ぶと site/stats.html と site/stats.json を書き出す
+# ・CI（pages.yml）では data/stats/ を actions/cache で実行間に持ち回す。消えると集計はゼロから
+#
+# data/stats/ の中身（すべてリトルエンディアンの固定長配列、行 i は各ファイルの i 番目）:
+#   day.u32   : 1970-01-01 からの日数（JST）
+#   kind.u8   : 0=日別合計 1=キーワード 2=フィード 3=出典ホスト
+#   key.u32   : keys.json の該当リスト内の番号（日別合計は 0）
+#   count.u32 : 件数（同じ (day, kind, key) が複数行あれば合算して読む）
+#   seen.u64  : 集計済みアイテムID（URL の blake2b 64bit）
+#   keys.json : {"kw": [...], "feed": [...], "host": [...]}
+#   state.json: {"gen": 列ファイルの世代, "rows": 確定した行数, "seen": 確定したID数}
+#
+# 書き込みの確定は state.json の置き換え（一時ファイル → rename）1回だけ:
+# ・追記は各ファイルを確定行数まで切り詰めてから足す。途中で落ちても state.json が古いままなので、
+#   読むときは確定行数までしか見ない（列ごとに長さがずれても行がずれない）
+# ・まとめ直し（compact）は次の世代のファイル（day.<世代>.u32 など）に書いてから state.json を切り替える
+#   世代 0 は従来の名前（day.u32 など）。state.json が無い古いデータは一番短い列に合わせて読む
+
+import os
+import sys
+import json
+import html
+import hashlib
+from array import array
+from datetime import date, datetime
+from pathlib import Path
+
+from itemindex import JST
+
+KINDS = ("day", "kw", "feed", "host")
+KIND_LABELS = {"kw": "キーワード", "feed": "フィード", "host": "出典"}
+COLUMNS = (("day", "I"), ("kind", "B"), ("key", "I"), ("count", "I"))
+EPOCH = date(1970, 1, 1).toordinal()
+TOP_N = 30
+TREND_DAYS = 7       # 直近この日数を
+BASE_DAYS = 28       # その前のこの日数の平均と比べる
+
+def _read_array(path: Path, typecode: str) -> array:
+    a = array(typecode)
+    if path.exists():
+        a.frombytes(path.read_bytes())
+        if sys.byteorder == "big":
+            a.byteswap()
+    return a
+
+def _to_bytes(a: array) -> bytes:
+    if sys.byteorder == "big":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+def _append(path: Path, a: array, committed: int):
+    # 確定済みの行数まで切り詰めてから足す（前回途中で落ちた分の書きかけを捨てる）
+    with open(path, "r+b" if path.exists() else "wb") as f:
+        f.truncate(committed * a.itemsize)
+        f.seek(0, os.SEEK_END)
+        f.write(_to_bytes(a))
+
+def _write_atomic(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def _col_path(stats_dir: Path, name: str, typecode: str, gen: int) -> Path:
+    ext = "u8" if typecode == "B" else "u32"
+    return stats_dir / (f"{name}.{ext}" if gen == 0 else f"{name}.{gen}.{ext}")
+
+def item_id(it: dict) -> int:
+    key = it.get("url") or it.get("title") or ""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+def day_number(ymd: str) -> int:
+    return date.fromisoformat(ymd).toordinal() - EPOCH
+
+def day_str(n: int) -> str:
+    return date.fromordinal(n + EPOCH).isoformat()
+
+class TrendStats:
+    def __init__(self, stats_dir: Path):
+        self.dir = stats_dir
+        keys_path = stats_dir / "keys.json"
+        self.keys = json.loads(keys_path.read_text(encoding="utf-8")) if keys_path.exists() else {}
+        for k in KINDS[1:]:
+            self.keys.setdefault(k, [])
+        self.key_ids = {k: {s: i for i, s in enumerate(v)} for k, v in self.keys.items()}
+
+        state_path = stats_dir / "state.json"
+        state = json.loads(state_path.read_text(encoding="utf-8")) if state_path.exists() else {}
+        self.gen = state.get("gen", 0)
+        cols = {name: _read_array(_col_path(stats_dir, name, tc, self.gen), tc) for name, tc in COLUMNS}
+        seen = _read_array(stats_dir / "seen.u64", "Q")
+        # 確定行数より後ろは書きかけなので読まない
+        self.rows_on_disk = state.get("rows", min(len(a) for a in cols.values()))
+        self.seen_on_disk = state.get("seen", len(seen))
+        self.agg = {}
+        n = self.rows_on_disk
+        for d, kd, ky, c in zip(cols["day"][:n], cols["kind"][:n], cols["key"][:n], cols["count"][:n]):
+            t = (d, kd, ky)
+            self.agg[t] = self.agg.get(t, 0) + c
+        self.seen = set(seen[:self.seen_on_disk])
+        self.delta = {}
+        self.new_ids = array("Q")
+
+    def _key(self, kind: str, s: str) -> int:
+        ids = self.key_ids[kind]
+        i = ids.get(s)
+        if i is None:
+            i = ids[s] = len(self.keys[kind])
+            self.keys[kind].append(s)
+        return i
+
+    def _bump(self, t: tuple):
+        self.agg[t] = self.agg.get(t, 0) + 1
+        self.delta[t] = self.delta.get(t, 0) + 1
+
+    def add_items(self, items: list[dict], day_of) -> int:
+        """未集計のアイテムだけ足し込む。day_of(item) → "YYYY-MM-DD"（空なら集計しない）。"""
+        added = 0
+        for it in items:
+            iid = item_id(it)
+            if iid in self.seen:
+                continue
+            ymd = day_of(it)
+            if not ymd:
+                continue
+            self.seen.add(iid)
+            self.new_ids.append(iid)
+            d = day_number(ymd)
+            self._bump((d, 0, 0))
+            for kw in set(it.get("keywords") or ()):
+                self._bump((d, 1, self._key("kw", kw)))
+            if it.get("feed"):
+                self._bump((d, 2, self._key("feed", it["feed"])))
+            if it.get("source"):
+                self._bump((d, 3, self._key("host", it["source"])))
+            added += 1
+        return added
+
+    def save(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # 重複行が増えすぎたら合算済みの形に書き直す。普段は今回分を末尾に足すだけ
+        compact = self.rows_on_disk + len(self.delta) > 2 * len(self.agg) + 1024
+        rows = self.agg if compact else self.delta
+        gen = self.gen + 1 if compact else self.gen
+        ordered = sorted(rows.items())
+        for i, (name, tc) in enumerate(COLUMNS):
+            a = array(tc, (t[i] for t, _ in ordered)) if i < 3 else array(tc, (c for _, c in ordered))
+            path = _col_path(self.dir, name, tc, gen)
+            if compact:
+                path.write_bytes(_to_bytes(a))  # 新しい世代なので切り替えまで誰も読まない
+            else:
+                _append(path, a, self.rows_on_disk)
+        _append(self.dir / "seen.u64", self.new_ids, self.seen_on_disk)
+        _write_atomic(self.dir / "keys.json", json.dumps(self.keys, ensure_ascii=False))
+        rows_on_disk = len(self.agg) if compact else self.rows_on_disk + len(self.delta)
+        seen_on_disk = self.seen_on_disk + len(self.new_ids)
+        # ここで確定
+        _write_atomic(self.dir / "state.json", json.dumps({"gen": gen, "rows": rows_on_disk, "seen": seen_on_disk}))
+        if compact:
+            for name, tc in COLUMNS:
+                old = _col_path(self.dir, name, tc, self.gen)
+                if old.exists():
+                    old.unlink()
+        self.gen, self.rows_on_disk, self.seen_on_disk = gen, rows_on_disk, seen_on_disk
+        self.delta = {}
+        self.new_ids = array("Q")
+
+    # ==== 参照系（すべて self.agg のみを見る）====
+    def daily(self) -> dict[str, int]:
+        out = {}
+        for (d, kd, _), c in self.agg.items():
+            if kd == 0:
+                out[day_str(d)] = out.get(day_str(d), 0) + c
+        return dict(sorted(out.items()))
+
+    def totals(self, kind: str, since: int | None = None, until: int | None = None) -> dict[str, int]:
+        kd = KINDS.index(kind)
+        names = self.keys[kind]
+        out = {}
+        for (d, k, ky), c in self.agg.items():
+            if k != kd or (since is not None and d < since) or (until is not None and d >= until):
+                continue
+            out[names[ky]] = out.get(names[ky], 0) + c
+        return out
+
+    def trending(self, kind: str, today: int) -> list[dict]:
+        """直近 TREND_DAYS 日の件数を、その前 BASE_DAYS 日の同じ長さあたり平均と比べる。"""
+        recent = self.totals(kind, today - TREND_DAYS + 1, today + 1)
+        base = self.totals(kind, today - TREND_DAYS - BASE_DAYS + 1, today - TREND_DAYS + 1)
+        rows = []
+        for name, n in recent.items():
+            expected = base.get(name, 0) * TREND_DAYS / BASE_DAYS
+            rows.append({"name": name, "recent": n, "expected": round(expected, 2),
+                         "lift": round((n + 1) / (expected + 1), 2)})
+        rows.sort(key=lambda r: (-r["lift"], -r["recent"], r["name"]))
+        return rows[:TOP_N]
+
+    def summary(self, today: int) -> dict:
+        def top(d):
+            return [{"name": k, "count": v} for k, v in sorted(d.items(), key=lambda kv: (-kv[1], kv[0]))[:TOP_N]]
+        out = {
+            "generated": datetime.now(JST).isoformat(timespec="seconds"),
+            "today": day_str(today),
+            "items_total": len(self.seen),
+            "daily": self.daily(),
+        }
+        for kind in KINDS[1:]:
+            out[kind] = {
+                "last_30d": top(self.totals(kind, today - 29, today + 1)),
+                "all_time": top(self.totals(kind)),
+                "trending": self.trending(kind, today),
+            }
+        return out
+
+def render_stats(summary: dict, site_dir: Path, css: str) -> Path:
+    (site_dir / "stats.json").write_text(json.dumps(summary, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    def table(rows, cols):
+        head = "".join(f"<th>{html.escape(label)}</th>" for _, label in cols)
+        body = "".join(
+            "<tr>" + "".join(f"<td>{html.escape(str(r[key]))}</td>" for key, _ in cols) + "</tr>"
+            for r in rows
+        )
+        return f"<table><tr>{head}</tr>{body}</table>"
+
+    daily = list(summary["daily"].items())[-30:]
+    parts = [
+        "<!DOCTYPE html>",
+        "<html lang=\"ja\">",
+        "<head>",
+        "<meta charset=\"utf-8\">",
+        "<title>集計｜岩手県 不動産まとめサイト</title>",
+        "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">",
+        f"<style>{css}table{{border-collapse:collapse;margin:8px 0 16px}}td,th{{border-bottom:1px solid #eee;padding:2px 10px;text-align:left}}</style>",
+        "</head>",
+        "<body>",
+        "<header>",
+        "<h1>集計（トレンド）</h1>",
+        f"<div class=\"desc\">集計日: {html.escape(summary['today'])} ／ 累計 {summary['items_total']} 件 ／ "
+        "<a href=\"stats.json\">JSON</a> ／ <a href=\"index.html\">トップへ</a></div>",
+        "</header>",
+        "<div class=\"date\">直近30日の件数</div>",
+        table([{"day": d, "count": c} for d, c in reversed(daily)], [("day", "日付"), ("count", "件数")]),
+    ]
+    for kind, label in KIND_LABELS.items():
+        parts += [
+            f"<div class=\"date\">{label}: 上昇中（直近{TREND_DAYS}日 / 前{BASE_DAYS}日平均）</div>",
+            table(summary[kind]["trending"], [("name", label), ("recent", "直近"), ("expected", "平常"), ("lift", "倍率")]),
+            f"<div class=\"date\">{label}: 直近30日</div>",
+            table(summary[kind]["last_30d"], [("name", label), ("count", "件数")]),
+        ]
+    parts += [
+        f"<footer>生成: {html.escape(summary['generated'])}</footer>",
+        "</body></html>",
+    ]
+    out = site_dir / "stats.html"
+    out.write_text("\n".join(parts), encoding="utf-8")
+    return out
+
+def update_and_render(items: list[dict], stats_dir: Path, site_dir: Path, day_of, css: str = "") -> Path:
+    stats = TrendStats(stats_dir)
+    added = stats.add_items(items, day_of)
+    stats.save()
+    # 日のキー（day_of）は JST。today も JST でそろえないと CI（UTC）で当日分が集計から漏れる
+    today = day_number(datetime.now(JST).strftime("%Y-%m-%d"))
+    out = render_stats(stats.summary(today), site_dir, css)
+    print(f"[stats] new={added} total={len(stats.seen)} rows={stats.rows_on_disk} → {out}")
+    return out